@@ -1,8 +1,33 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from .models import User, Document, PremiumFeature, ConversionPricing, Transaction
 
 
+class FasterAdminPaginator(Paginator):
+    """Paginator that estimates unfiltered counts from PostgreSQL statistics"""
+    # Below this many rows an exact COUNT(*) is cheap enough
+    estimate_threshold = 10000
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            # reltuples is -1/0 until the table has been analyzed
+            if row and row[0] > self.estimate_threshold:
+                return row[0]
+        return super().count
+
+
 class UserAdmin(BaseUserAdmin):
     list_display = ['username', 'email', 'balance', 'free_conversions', 'is_staff']
     fieldsets = BaseUserAdmin.fieldsets + (
@@ -16,6 +41,9 @@ class DocumentAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'user__email', 'original_file']
     readonly_fields = ['id', 'created_at', 'completed_at']
     date_hierarchy = 'created_at'
+    list_select_related = ['user']
+    paginator = FasterAdminPaginator
+    show_full_result_count = False
 
 
 class PremiumFeatureAdmin(admin.ModelAdmin):
@@ -54,10 +82,14 @@ class ConversionPricingAdmin(admin.ModelAdmin):
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ['created_at', 'user', 'transaction_type', 'operation_type', 'formatted_amount', 'payment_method', 'is_successful']
     list_filter = ['transaction_type', 'operation_type', 'payment_method', 'is_successful', 'created_at']
-    search_fields = ['user__username', 'user__email', 'description', 'document__original_file']
+    search_fields = ['user__username', 'user__email', 'description']
     readonly_fields = ['id', 'created_at', 'balance_before', 'balance_after', 'free_conversions_before', 'free_conversions_after']
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
+    list_select_related = ['user', 'document']
+    raw_id_fields = ['user', 'document']
+    paginator = FasterAdminPaginator
+    show_full_result_count = False
     
     fieldsets = (
         ('Transaction Info', {
@@ -74,9 +106,6 @@ class TransactionAdmin(admin.ModelAdmin):
         }),
     )
     
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user', 'document')
-    
     def formatted_amount(self, obj):
         return obj.formatted_amount
     formatted_amount.short_description = 'Amount'
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Admin search uses icontains, which PostgreSQL compiles to
+# UPPER(col::text) LIKE UPPER(%s), so the indexes cover that expression.
+TRIGRAM_INDEXES = [
+    ('document_transaction_description_trgm', 'document_transaction', 'description'),
+    ('document_user_username_trgm', 'document_user', 'username'),
+    ('document_user_email_trgm', 'document_user', 'email'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} '
+            f'USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('document', '0005_document_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
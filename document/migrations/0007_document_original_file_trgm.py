@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def create_original_file_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS document_document_original_file_trgm '
+        'ON document_document USING gin (UPPER(original_file::text) gin_trgm_ops)'
+    )
+
+
+def drop_original_file_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS document_document_original_file_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('document', '0006_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_original_file_index, drop_original_file_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-14 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('document', '0007_document_original_file_trgm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='cost',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Amount charged in EUR', max_digits=6),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='page_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-14 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('document', '0008_document_page_count_cost'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['user', 'document_type', '-created_at'], name='doc_user_type_created_idx'),
+        ),
+    ]
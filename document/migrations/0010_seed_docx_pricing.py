@@ -0,0 +1,30 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def seed_docx_pricing(apps, schema_editor):
+    ConversionPricing = apps.get_model('document', 'ConversionPricing')
+    ConversionPricing.objects.get_or_create(
+        operation_type='docx_to_pdf',
+        defaults={
+            'base_price': Decimal('0.60'),
+            'price_per_page': Decimal('0.10'),
+            'pricing_type': 'file_plus_pages',
+            'minimum_charge': Decimal('0.60'),
+            'is_free_operation': False,
+            'free_limit': 3,
+            'description': 'Convert DOCX files to PDF',
+        }
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('document', '0009_document_user_type_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_docx_pricing, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,33 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
+from django.core.cache import cache
+from decimal import Decimal
+import functools
 import uuid
 
+PRICING_CACHE_TIMEOUT = 60 * 60  # 1 hour
+HOME_PRICING_CACHE_KEY = 'home_pricing'
+HOME_PRICING_CACHE_TIMEOUT = 60 * 15  # 15 minutes
+
+
+# Used to create a missing pricing row; must match the row seeded by migration 0010
+DEFAULT_PRICING = {
+    'docx_to_pdf': {
+        'base_price': Decimal('0.60'),
+        'price_per_page': Decimal('0.10'),
+        'pricing_type': 'file_plus_pages',
+        'minimum_charge': Decimal('0.60'),
+        'is_free_operation': False,
+        'free_limit': 3,
+        'description': 'Convert DOCX files to PDF',
+    },
+}
+
+
+def pricing_cache_key(operation_type):
+    """Cache key for a single ConversionPricing row"""
+    return f'pricing:{operation_type}'
+
 
 class User(AbstractUser):
     """Custom user model with balance tracking"""
@@ -11,72 +37,82 @@ class User(AbstractUser):
     
     def can_convert(self):
         """Check if user can perform conversion"""
-        return self.free_conversions > 0 or self.balance > 0
+        return self.free_conversions > 0 or self.balance > Decimal('0')
     
-    def use_conversion(self, operation_type='docx_to_pdf', request=None, document=None, page_count=1):
+    def use_conversion(self, operation_type='docx_to_pdf', request=None, document=None, page_count=1, ip_address=None):
         """Deduct conversion cost from user account and record transaction"""
         from .models import ConversionPricing, Transaction
         
         # Get pricing info
-        try:
-            pricing = ConversionPricing.objects.get(operation_type=operation_type)
-        except ConversionPricing.DoesNotExist:
-            pricing = ConversionPricing.objects.create(
-                operation_type=operation_type,
-                base_price=0.50,
-                price_per_page=0.10,
-                pricing_type='file_plus_pages',
-                minimum_charge=0.10,
-                description=f'{operation_type.upper()} conversion'
-            )
-        
-        # Store current state
-        balance_before = self.balance
-        free_conversions_before = self.free_conversions
+        pricing = ConversionPricing.objects.get_cached(operation_type, defaults=DEFAULT_PRICING.get(operation_type, {
+            'base_price': Decimal('0.50'),
+            'price_per_page': Decimal('0.10'),
+            'pricing_type': 'file_plus_pages',
+            'minimum_charge': Decimal('0.10'),
+            'description': f'{operation_type.upper()} conversion',
+        }))
         
         # Calculate actual cost based on page count
         calculated_cost = pricing.calculate_cost(page_count)
         
-        # Determine payment method and cost
-        if self.free_conversions > 0:
-            # Use free conversion
-            self.free_conversions -= 1
-            payment_method = 'free_conversion'
-            amount = 0.00
-            success = True
-        elif self.balance >= calculated_cost:
-            # Use balance
-            self.balance -= calculated_cost
-            payment_method = 'balance'
-            amount = calculated_cost
-            success = True
-        else:
-            # Insufficient funds
-            success = False
-            payment_method = 'balance'
-            amount = calculated_cost
-        
-        if success:
-            self.save()
+        with transaction.atomic():
+            # Lock the user row so concurrent conversions cannot double-spend
+            user = User.objects.select_for_update().get(pk=self.pk)
+            
+            # Store current state
+            balance_before = user.balance
+            free_conversions_before = user.free_conversions
+            
+            # Determine payment method and cost
+            if user.free_conversions > 0:
+                # Use free conversion
+                user.free_conversions -= 1
+                payment_method = 'free_conversion'
+                amount = Decimal('0.00')
+                success = True
+            elif user.balance >= calculated_cost:
+                # Use balance
+                user.balance -= calculated_cost
+                payment_method = 'balance'
+                amount = calculated_cost
+                success = True
+            else:
+                # Insufficient funds
+                success = False
+                payment_method = 'balance'
+                amount = calculated_cost
+            
+            if success:
+                user.save(update_fields=['balance', 'free_conversions'])
+            
+            # Record transaction
+            record = Transaction.objects.create(
+                user=user,
+                document=document,
+                transaction_type='conversion',
+                operation_type=operation_type,
+                amount=amount,
+                payment_method=payment_method,
+                balance_before=balance_before,
+                balance_after=user.balance,
+                free_conversions_before=free_conversions_before,
+                free_conversions_after=user.free_conversions,
+                description=f'{pricing.get_operation_type_display()} conversion',
+                is_successful=success,
+                ip_address=request.META.get('REMOTE_ADDR') if request else ip_address
+            )
+            
+            if document is not None:
+                # Store pricing outcome on the document so status checks don't recompute it
+                document.page_count = page_count
+                document.cost = amount if success else Decimal('0.00')
+                document.save(update_fields=['page_count', 'cost'])
         
-        # Record transaction
-        transaction = Transaction.objects.create(
-            user=self,
-            document=document,
-            transaction_type='conversion',
-            operation_type=operation_type,
-            amount=amount,
-            payment_method=payment_method,
-            balance_before=balance_before,
-            balance_after=self.balance,
-            free_conversions_before=free_conversions_before,
-            free_conversions_after=self.free_conversions,
-            description=f'{pricing.get_operation_type_display()} conversion',
-            is_successful=success,
-            ip_address=request.META.get('REMOTE_ADDR') if request else None
-        )
+        # Keep this instance in sync with the locked row
+        self.balance = user.balance
+        self.free_conversions = user.free_conversions
         
-        return success, transaction
+        return success, record
 
 
 class Document(models.Model):
@@ -106,9 +142,17 @@ class Document(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     file_size = models.IntegerField(default=0)  # in bytes
     is_premium = models.BooleanField(default=False)
+    page_count = models.PositiveIntegerField(default=0)
+    cost = models.DecimalField(max_digits=6, decimal_places=2, default=0, help_text="Amount charged in EUR")
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['status', '-created_at']),
+            models.Index(fields=['user', 'document_type', '-created_at'], name='doc_user_type_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.original_file.name}"
@@ -130,6 +174,44 @@ class PremiumFeature(models.Model):
         return self.name
 
 
+@functools.lru_cache(maxsize=128)
+def _cost_function(pricing_type, base_price, price_per_page, free_pages, minimum_charge, max_price):
+    """Cost formula specialised for one set of pricing values"""
+    if pricing_type == 'per_page':
+        def cost(page_count):
+            return price_per_page * page_count
+    elif pricing_type == 'file_plus_pages':
+        # Base price + additional pages beyond free_pages
+        def cost(page_count):
+            return base_price + (max(0, page_count - free_pages) * price_per_page)
+    else:
+        def cost(page_count):
+            return base_price
+    
+    # Apply minimum charge, and the maximum price cap if set
+    if max_price > 0:
+        return lambda page_count: min(max(cost(page_count), minimum_charge), max_price)
+    return lambda page_count: max(cost(page_count), minimum_charge)
+
+
+class ConversionPricingManager(models.Manager):
+    """Manager with cached lookups for the rarely changing pricing table"""
+    
+    def get_cached(self, operation_type, defaults=None):
+        """Get pricing by operation type, served from cache when possible
+        
+        If defaults are given, a missing row is created with them instead of
+        raising DoesNotExist. Entries are dropped by the signals in
+        document/signals.py, which needs a cache shared by web and worker.
+        """
+        def load():
+            if defaults is None:
+                return self.get(operation_type=operation_type)
+            return self.get_or_create(operation_type=operation_type, defaults=defaults)[0]
+        
+        return cache.get_or_set(pricing_cache_key(operation_type), load, PRICING_CACHE_TIMEOUT)
+
+
 class ConversionPricing(models.Model):
     """Pricing for different conversion operations"""
     OPERATION_CHOICES = [
@@ -174,6 +256,8 @@ class ConversionPricing(models.Model):
     is_active = models.BooleanField(default=True)
     minimum_charge = models.DecimalField(max_digits=5, decimal_places=2, default=0.10, help_text="Minimum charge per operation")
     
+    objects = ConversionPricingManager()
+    
     class Meta:
         ordering = ['operation_type']
         verbose_name = 'Conversion Pricing'
@@ -181,25 +265,12 @@ class ConversionPricing(models.Model):
     
     def calculate_cost(self, page_count=1):
         """Calculate cost based on pricing model and page count"""
-        if self.pricing_type == 'fixed':
-            cost = self.base_price
-        elif self.pricing_type == 'per_page':
-            cost = self.price_per_page * page_count
-        elif self.pricing_type == 'file_plus_pages':
-            # Base price + additional pages beyond free_pages
-            additional_pages = max(0, page_count - self.free_pages)
-            cost = self.base_price + (additional_pages * self.price_per_page)
-        else:
-            cost = self.base_price
-        
-        # Apply minimum charge
-        cost = max(cost, self.minimum_charge)
-        
-        # Apply maximum price cap if set
-        if self.max_price_per_file > 0:
-            cost = min(cost, self.max_price_per_file)
-        
-        return cost
+        # Looked up from the current field values, so edits to this instance apply at once
+        cost_fn = _cost_function(
+            self.pricing_type, self.base_price, self.price_per_page,
+            self.free_pages, self.minimum_charge, self.max_price_per_file
+        )
+        return cost_fn(page_count)
     
     def get_pricing_description(self, page_count=1):
         """Get human-readable pricing description"""
@@ -276,6 +347,10 @@ class Transaction(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Transaction'
         verbose_name_plural = 'Transactions'
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['transaction_type', '-created_at']),
+        ]
     
     def __str__(self):
         if self.transaction_type == 'conversion':
@@ -290,4 +365,14 @@ class Transaction(models.Model):
         """Format amount with euro symbol"""
         if self.amount == 0:
             return "Free"
-        return f"€{self.amount}"
\ No newline at end of file
+        return f"€{self.amount}"
+    
+    @classmethod
+    def record_many(cls, entries, batch_size=500):
+        """Insert many transactions at once (bulk refunds, admin scripts)
+        
+        Each entry is a dict of Transaction field values; rows are written
+        with bulk_create, so save() and model signals are not triggered.
+        """
+        transactions = [cls(**entry) for entry in entries]
+        return cls.objects.bulk_create(transactions, batch_size=batch_size)
\ No newline at end of file
@@ -0,0 +1,17 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import ConversionPricing, HOME_PRICING_CACHE_KEY, pricing_cache_key
+
+
+@receiver([post_save, post_delete], sender=ConversionPricing)
+def invalidate_pricing_cache(sender, instance, **kwargs):
+    """Drop cached pricing when a pricing row changes
+    
+    This reaches the worker that charges users only because CACHES is shared
+    between processes (Redis or memcached), not per-process memory.
+    """
+    keys = [pricing_cache_key(instance.operation_type), HOME_PRICING_CACHE_KEY]
+    # Wait for commit, or a concurrent read could re-cache the old row for the full timeout
+    transaction.on_commit(lambda: cache.delete_many(keys))
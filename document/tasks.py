@@ -0,0 +1,101 @@
+import tempfile
+from pathlib import Path
+from celery import shared_task
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from .models import Document
+
+
+@shared_task(bind=True, max_retries=3)
+def convert_docx_to_pdf_task(self, document_id, ip_address=None):
+    """Convert an uploaded DOCX to PDF and charge the owner on success"""
+    from .views import convert_docx_to_pdf
+    
+    document = Document.objects.select_related('user').get(pk=document_id)
+    
+    # Tasks are acked late, so a redelivered copy may find the document already finished
+    if document.status != 'processing':
+        return document.status
+    
+    # The upload may not be visible on the shared media volume yet
+    if not document.original_file.storage.exists(document.original_file.name):
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=2)
+        document.status = 'failed'
+        document.save(update_fields=['status'])
+        return document.status
+    
+    # Uploads can be queued faster than they are charged; don't convert for a user who can't pay
+    if not document.user.can_convert():
+        document.status = 'failed'
+        document.save(update_fields=['status'])
+        return document.status
+    
+    pdf_filename = f"{Path(document.original_file.name).stem}.pdf"
+    
+    # Render into a temp file and let storage copy it, so the PDF is never held in memory
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as pdf_file:
+        try:
+            # Read through storage rather than .path, which only exists on local disk
+            with document.original_file.open('rb') as docx_file:
+                converted = convert_docx_to_pdf(docx_file, pdf_file.name)
+        except Exception as e:
+            print(f"Conversion task error: {e}")
+            converted = None
+        
+        if not converted:
+            document.status = 'failed'
+            document.save(update_fields=['status'])
+            return document.status
+        
+        try:
+            # Save converted file
+            document.converted_file.save(pdf_filename, File(pdf_file), save=False)
+        except Exception as e:
+            print(f"Saving converted file failed: {e}")
+            document.status = 'failed'
+            document.save(update_fields=['status'])
+            return document.status
+    
+    # Charge and publish the result together; an unpaid conversion is never marked completed
+    try:
+        with transaction.atomic():
+            # Re-check under a row lock so only one delivery of this task can bill
+            current_status = Document.objects.select_for_update().values_list('status', flat=True).get(pk=document.pk)
+            if current_status != 'processing':
+                document.status = current_status
+                success = False
+            else:
+                # Deduct conversion and record transaction
+                success, record = document.user.use_conversion(
+                    operation_type='docx_to_pdf',
+                    document=document,
+                    page_count=1,  # For now, assume 1 page - in real app, extract from DOCX
+                    ip_address=ip_address
+                )
+                
+                if success:
+                    document.status = 'completed'
+                    document.completed_at = timezone.now()
+                    # One narrow UPDATE for the final state instead of a full-row save()
+                    Document.objects.filter(pk=document.pk).update(
+                        status=document.status,
+                        completed_at=document.completed_at,
+                        converted_file=document.converted_file.name
+                    )
+                else:
+                    document.status = 'failed'
+                    document.save(update_fields=['status'])
+    except Exception as e:
+        # Everything above was rolled back; don't leave the document in 'processing'
+        print(f"Conversion billing error: {e}")
+        success = False
+        document.status = 'failed'
+        document.save(update_fields=['status'])
+    
+    if not success:
+        # This run's PDF was never linked to the row; remove it from storage
+        document.converted_file.delete(save=False)
+    
+    return document.status
@@ -1,3 +1,196 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from docx import Document as DocxDocument
+
+from .models import ConversionPricing, Document, Transaction, User, pricing_cache_key
+from .tasks import convert_docx_to_pdf_task
+
+
+def make_docx():
+    """Build a small DOCX upload in memory"""
+    doc = DocxDocument()
+    doc.add_paragraph('Hello world')
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return ContentFile(buffer.getvalue(), name='test.docx')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ConvertTaskBillingTests(TestCase):
+    """The conversion task must only complete documents it could charge for"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+    def queue_document(self, user):
+        return Document.objects.create(
+            user=user,
+            original_file=make_docx(),
+            document_type='docx',
+            status='processing'
+        )
+
+    def test_queued_uploads_beyond_free_conversions_fail(self):
+        user = User.objects.create_user('queued', password='x', free_conversions=1, balance=Decimal('0.00'))
+        documents = [self.queue_document(user) for _ in range(3)]
+
+        for document in documents:
+            convert_docx_to_pdf_task.apply(args=[document.id])
+
+        statuses = [Document.objects.get(pk=document.pk).status for document in documents]
+        self.assertEqual(statuses, ['completed', 'failed', 'failed'])
+        for document in documents[1:]:
+            self.assertFalse(Document.objects.get(pk=document.pk).converted_file)
+        self.assertEqual(Transaction.objects.filter(user=user, is_successful=True).count(), 1)
+
+    def test_insufficient_balance_does_not_complete(self):
+        # Passes can_convert() but cannot cover the charge
+        user = User.objects.create_user('poor', password='x', free_conversions=0, balance=Decimal('0.05'))
+        document = self.queue_document(user)
+
+        convert_docx_to_pdf_task.apply(args=[document.id])
+
+        document.refresh_from_db()
+        user.refresh_from_db()
+        self.assertEqual(document.status, 'failed')
+        self.assertFalse(document.converted_file)
+        self.assertEqual(document.cost, Decimal('0.00'))
+        self.assertEqual(user.balance, Decimal('0.05'))
+        self.assertFalse(Transaction.objects.get(user=user).is_successful)
+
+    def test_error_after_conversion_marks_failed(self):
+        user = User.objects.create_user('unlucky', password='x', free_conversions=1)
+        document = self.queue_document(user)
+
+        with mock.patch.object(User, 'use_conversion', side_effect=RuntimeError('db down')):
+            convert_docx_to_pdf_task.apply(args=[document.id])
+
+        document.refresh_from_db()
+        user.refresh_from_db()
+        self.assertEqual(document.status, 'failed')
+        self.assertFalse(document.converted_file)
+        self.assertEqual(user.free_conversions, 1)
+
+    def test_redelivered_task_charges_once(self):
+        user = User.objects.create_user('twice', password='x', free_conversions=3)
+        document = self.queue_document(user)
+
+        convert_docx_to_pdf_task.apply(args=[document.id])
+        convert_docx_to_pdf_task.apply(args=[document.id])
+
+        user.refresh_from_db()
+        self.assertEqual(Document.objects.get(pk=document.pk).status, 'completed')
+        self.assertEqual(user.free_conversions, 2)
+        self.assertEqual(Transaction.objects.filter(user=user).count(), 1)
+
+    def test_concurrent_delivery_finishing_first_is_not_billed_again(self):
+        user = User.objects.create_user('racer', password='x', free_conversions=3)
+        document = self.queue_document(user)
+
+        def finish_elsewhere(docx_file, out_path):
+            # Another delivery completes the document while this one is converting
+            Document.objects.filter(pk=document.pk).update(status='completed')
+            with open(out_path, 'wb') as pdf_file:
+                pdf_file.write(b'%PDF-1.4')
+            return out_path
+
+        with mock.patch('document.views.convert_docx_to_pdf', side_effect=finish_elsewhere):
+            convert_docx_to_pdf_task.apply(args=[document.id])
+
+        user.refresh_from_db()
+        self.assertEqual(user.free_conversions, 3)
+        self.assertFalse(Transaction.objects.filter(user=user).exists())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PricingDefaultsTests(TestCase):
+    """A missing pricing row is recreated with the same prices wherever it is first needed"""
+
+    def setUp(self):
+        cache.clear()
+        ConversionPricing.objects.filter(operation_type='docx_to_pdf').delete()
+
+    def test_billing_recreates_seeded_docx_pricing(self):
+        user = User.objects.create_user('payer', password='x', free_conversions=0, balance=Decimal('5.00'))
+
+        success, record = user.use_conversion(operation_type='docx_to_pdf')
+
+        pricing = ConversionPricing.objects.get(operation_type='docx_to_pdf')
+        self.assertTrue(success)
+        self.assertEqual((pricing.base_price, pricing.minimum_charge), (Decimal('0.60'), Decimal('0.60')))
+        self.assertEqual(record.amount, Decimal('0.70'))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PricingCacheInvalidationTests(TestCase):
+    """Cached pricing is dropped only once the edit is committed"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_edit_invalidates_cache_on_commit(self):
+        pricing = ConversionPricing.objects.get_cached('docx_to_pdf')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pricing.base_price = Decimal('2.00')
+            pricing.save()
+            # Not committed yet; a reader here must not repopulate the cache with the old row
+            self.assertEqual(cache.get(pricing_cache_key('docx_to_pdf')).base_price, Decimal('0.60'))
+
+        self.assertIsNone(cache.get(pricing_cache_key('docx_to_pdf')))
+        self.assertEqual(ConversionPricing.objects.get_cached('docx_to_pdf').base_price, Decimal('2.00'))
+
+
+class PricingCostTests(TestCase):
+    """calculate_cost follows edits to a loaded pricing row"""
+
+    def test_cost_reflects_edited_fields(self):
+        pricing = ConversionPricing.objects.get(operation_type='docx_to_pdf')
+        self.assertEqual(pricing.calculate_cost(1), Decimal('0.70'))
+
+        pricing.base_price = Decimal('9.00')
+        pricing.save()
+        self.assertEqual(pricing.calculate_cost(1), Decimal('9.10'))
+
+        pricing.pricing_type = 'fixed'
+        self.assertEqual(pricing.calculate_cost(3), Decimal('9.00'))
+
+
+class TransactionsPaginationTests(TestCase):
+    """The transaction history cursor must not skip rows that share a timestamp"""
+
+    def test_pages_cover_rows_with_equal_timestamps(self):
+        user = User.objects.create_user('history', password='x')
+        Transaction.record_many([
+            {'user': user, 'transaction_type': 'balance_add', 'payment_method': 'balance', 'amount': Decimal('1.00')}
+            for _ in range(45)
+        ])
+        # Bulk inserts can share created_at; force the worst case
+        Transaction.objects.filter(user=user).update(created_at=timezone.now())
+        self.client.force_login(user)
+
+        seen = []
+        url = '/transactions/'
+        while True:
+            response = self.client.get(url)
+            seen.extend(t.id for t in response.context['transactions'])
+            if not response.context['next_cursor']:
+                break
+            url = '/transactions/?' + urlencode({'before': response.context['next_cursor']})
+
+        self.assertEqual(len(seen), 45)
+        self.assertEqual(set(seen), set(Transaction.objects.filter(user=user).values_list('id', flat=True)))
@@ -1,8 +1,9 @@
 """
 Utility functions for PDF conversion with Cyrillic support
 """
-import io
+import functools
 import os
+import re
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -12,8 +13,9 @@ from reportlab.lib.colors import black
 from docx import Document as DocxDocument
 
 
+@functools.lru_cache(maxsize=1)
 def register_cyrillic_fonts():
-    """Register fonts that support Cyrillic characters"""
+    """Register fonts that support Cyrillic characters (once per process)"""
     font_configs = [
         {
             'name': 'DejaVuSans',
@@ -51,11 +53,12 @@ def register_cyrillic_fonts():
                     print(f"Failed to register {config['name']}: {e}")
                     continue
     
-    return registered_fonts
+    return tuple(registered_fonts)
 
 
+@functools.lru_cache(maxsize=1)
 def create_cyrillic_styles():
-    """Create paragraph styles that support Cyrillic text"""
+    """Create paragraph styles that support Cyrillic text (shared, do not mutate)"""
     # Try to register fonts
     registered_fonts = register_cyrillic_fonts()
     
@@ -113,16 +116,15 @@ def create_cyrillic_styles():
     return styles
 
 
-def convert_docx_to_pdf_with_cyrillic(docx_path):
-    """Convert DOCX to PDF with proper Cyrillic support"""
+def convert_docx_to_pdf_with_cyrillic(docx_file, out_path):
+    """Convert DOCX (path or file object) to PDF with proper Cyrillic support, writing the PDF to out_path"""
     try:
         # Read DOCX
-        doc = DocxDocument(docx_path)
+        doc = DocxDocument(docx_file)
         
-        # Create PDF buffer
-        buffer = io.BytesIO()
+        # ReportLab writes the PDF straight to out_path
         pdf_doc = SimpleDocTemplate(
-            buffer,
+            out_path,
             pagesize=A4,
             topMargin=72,
             bottomMargin=72,
@@ -140,8 +142,10 @@ def convert_docx_to_pdf_with_cyrillic(docx_path):
         story.append(Paragraph("Converted Document", styles['title']))
         story.append(Spacer(1, 20))
         
-        # Process paragraphs
-        for i, para in enumerate(doc.paragraphs):
+        # Process paragraphs (doc.paragraphs rebuilds the list on every access)
+        paragraphs = list(doc.paragraphs)
+        last_index = len(paragraphs) - 1
+        for i, para in enumerate(paragraphs):
             text = para.text.strip()
             if not text:
                 continue
@@ -157,7 +161,7 @@ def convert_docx_to_pdf_with_cyrillic(docx_path):
                     story.append(Paragraph(text, styles['normal']))
                 
                 # Add some spacing between paragraphs
-                if i < len(doc.paragraphs) - 1:
+                if i < last_index:
                     story.append(Spacer(1, 6))
                     
             except Exception as para_error:
@@ -177,31 +181,29 @@ def convert_docx_to_pdf_with_cyrillic(docx_path):
         # Build PDF
         pdf_doc.build(story)
         
-        # Get PDF content
-        pdf_content = buffer.getvalue()
-        buffer.close()
-        
-        return pdf_content
+        return out_path
         
     except Exception as e:
         print(f"Cyrillic conversion error: {e}")
         return None
 
 
+_XML_ESCAPE_TABLE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&apos;',
+})
+
+
 def escape_xml_chars(text):
     """Escape characters that might cause XML parsing issues"""
-    replacements = {
-        '&': '&amp;',
-        '<': '&lt;',
-        '>': '&gt;',
-        '"': '&quot;',
-        "'": '&apos;',
-    }
-    
-    for char, replacement in replacements.items():
-        text = text.replace(char, replacement)
-    
-    return text
+    return text.translate(_XML_ESCAPE_TABLE)
+
+
+# Common heading words in Russian documents
+_HEADING_RE = re.compile(r'глава|раздел|часть|введение|заключение|содержание', re.IGNORECASE)
 
 
 def is_heading_paragraph(para, text):
@@ -217,33 +219,33 @@ def is_heading_paragraph(para, text):
     # Check if it's a short line that might be a heading
     if len(text.split()) <= 8 and len(text) < 80:
         # Look for common heading patterns
-        heading_indicators = ['глава', 'раздел', 'часть', 'введение', 'заключение', 'содержание']
-        if any(indicator in text.lower() for indicator in heading_indicators):
+        if _HEADING_RE.search(text):
             return True
     
     return False
 
 
+# Cyrillic to Latin mapping used by the transliteration fallback
+CYRILLIC_TO_LATIN = {
+    # Lowercase
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    
+    # Uppercase  
+    'А': 'A', 'Б': 'B', 'В': 'V', 'Г': 'G', 'Д': 'D', 'Е': 'E', 'Ё': 'YO',
+    'Ж': 'ZH', 'З': 'Z', 'И': 'I', 'Й': 'Y', 'К': 'K', 'Л': 'L', 'М': 'M',
+    'Н': 'N', 'О': 'O', 'П': 'P', 'Р': 'R', 'С': 'S', 'Т': 'T', 'У': 'U',
+    'Ф': 'F', 'Х': 'H', 'Ц': 'TS', 'Ч': 'CH', 'Ш': 'SH', 'Щ': 'SCH',
+    'Ъ': '', 'Ы': 'Y', 'Ь': '', 'Э': 'E', 'Ю': 'YU', 'Я': 'YA'
+}
+
+# Keys are single characters, so one translate() pass handles multi-letter values too
+_TRANSLIT_TABLE = str.maketrans(CYRILLIC_TO_LATIN)
+
+
 def transliterate_cyrillic(text):
     """Transliterate Cyrillic text to Latin as fallback"""
-    replacements = {
-        # Lowercase
-        'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo',
-        'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
-        'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
-        'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
-        'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
-        
-        # Uppercase  
-        'А': 'A', 'Б': 'B', 'В': 'V', 'Г': 'G', 'Д': 'D', 'Е': 'E', 'Ё': 'YO',
-        'Ж': 'ZH', 'З': 'Z', 'И': 'I', 'Й': 'Y', 'К': 'K', 'Л': 'L', 'М': 'M',
-        'Н': 'N', 'О': 'O', 'П': 'P', 'Р': 'R', 'С': 'S', 'Т': 'T', 'У': 'U',
-        'Ф': 'F', 'Х': 'H', 'Ц': 'TS', 'Ч': 'CH', 'Ш': 'SH', 'Щ': 'SCH',
-        'Ъ': '', 'Ы': 'Y', 'Ь': '', 'Э': 'E', 'Ю': 'YU', 'Я': 'YA'
-    }
-    
-    result = text
-    for cyrillic, latin in replacements.items():
-        result = result.replace(cyrillic, latin)
-    
-    return result
\ No newline at end of file
+    return text.translate(_TRANSLIT_TABLE)
@@ -1,26 +1,53 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import HttpResponse, FileResponse, JsonResponse
-from django.core.files.base import ContentFile
-from django.utils import timezone
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from django.utils.http import content_disposition_header
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.db import models
-from .models import Document, User, PremiumFeature, ConversionPricing, Transaction
+from django.core.cache import cache
+from django.db import models, transaction
+from .models import (
+    Document, User, PremiumFeature, ConversionPricing, Transaction,
+    DEFAULT_PRICING, HOME_PRICING_CACHE_KEY, HOME_PRICING_CACHE_TIMEOUT,
+)
 from .forms import UserRegistrationForm
-import io
+from .tasks import convert_docx_to_pdf_task
+from .utils import convert_docx_to_pdf_with_cyrillic, escape_xml_chars, transliterate_cyrillic
+from docx import Document as DocxDocument
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet
 import os
+import re
 import tempfile
 import json
-from pathlib import Path
+import uuid
+from decimal import Decimal
+from urllib.parse import quote
+
+# Fallback converter styles, built once per process rather than per conversion
+_STYLES = getSampleStyleSheet()
+# Space paragraphs via the style instead of a Spacer flowable per paragraph
+_STYLES['Normal'].spaceAfter = 12
+
+# Cyrillic letters, scanned in C rather than a per-character Python loop
+_CYRILLIC_RE = re.compile(r'[\u0410-\u044f\u0401\u0451]')
 
 
 def home(request):
     """Landing page view"""
-    # Get pricing for all operations
-    pricing_data = {}
+    # The page itself shows per-user balance, so only the pricing is cached
+    pricing_data = cache.get_or_set(HOME_PRICING_CACHE_KEY, get_home_pricing, HOME_PRICING_CACHE_TIMEOUT)
+    return render(request, 'home.html', {'pricing': pricing_data})
+
+
+def get_home_pricing():
+    """Get pricing for all operations shown on the landing page"""
     operation_mapping = {
         'docx': 'docx_to_pdf',
         'xlsx': 'xlsx', 
@@ -30,15 +57,14 @@ def home(request):
         'compress': 'compress'
     }
     
-    for display_key, operation_type in operation_mapping.items():
-        try:
-            pricing = ConversionPricing.objects.get(operation_type=operation_type)
-            pricing_data[display_key] = pricing
-        except ConversionPricing.DoesNotExist:
-            # Create default if doesn't exist
-            pricing_data[display_key] = None
-    
-    return render(request, 'home.html', {'pricing': pricing_data})
+    # One query for all operations; missing rows map to None
+    rows = ConversionPricing.objects.filter(
+        operation_type__in=operation_mapping.values()
+    ).in_bulk(field_name='operation_type')
+    return {
+        display_key: rows.get(operation_type)
+        for display_key, operation_type in operation_mapping.items()
+    }
 
 
 def register(request):
@@ -71,23 +97,10 @@ def convert_view(request):
     recent_documents = Document.objects.filter(
         user=request.user,
         document_type='docx'
-    )[:5]
+    ).only('id', 'status', 'original_file', 'converted_file', 'created_at')[:5]
     
-    # Get pricing info for DOCX conversion
-    try:
-        docx_pricing = ConversionPricing.objects.get(operation_type='docx_to_pdf')
-    except ConversionPricing.DoesNotExist:
-        # Create default pricing if not exists
-        docx_pricing = ConversionPricing.objects.create(
-            operation_type='docx_to_pdf',
-            base_price=0.60,
-            price_per_page=0.10,
-            pricing_type='file_plus_pages',
-            minimum_charge=0.60,
-            is_free_operation=False,
-            free_limit=3,
-            description='Convert DOCX files to PDF'
-        )
+    # Get pricing info for DOCX conversion (seeded by migration, created if missing)
+    docx_pricing = ConversionPricing.objects.get_cached('docx_to_pdf', defaults=DEFAULT_PRICING['docx_to_pdf'])
     
     if request.method == 'POST':
         if not request.user.can_convert():
@@ -117,53 +130,27 @@ def convert_view(request):
                 status='processing'
             )
             
-            # Store document ID in session for JS polling
-            request.session['current_conversion_id'] = str(document.id)
+            # Convert on a Celery worker once the document row is committed;
+            # the page polls conversion_status for the result
+            document_id = str(document.id)
+            ip_address = request.META.get('REMOTE_ADDR')
+            transaction.on_commit(lambda: convert_docx_to_pdf_task.delay(document_id, ip_address))
             
-            # Perform conversion in background-like manner
-            # (In a real app, this would be a Celery task)
-            try:
-                pdf_content = convert_docx_to_pdf(document.original_file.path)
-                
-                if pdf_content:
-                    # Save converted file
-                    pdf_filename = f"{Path(docx_file.name).stem}.pdf"
-                    document.converted_file.save(
-                        pdf_filename,
-                        ContentFile(pdf_content),
-                        save=False
-                    )
-                    document.status = 'completed'
-                    document.completed_at = timezone.now()
-                    document.save()
-                    
-                    # Deduct conversion and record transaction
-                    success, transaction = request.user.use_conversion(
-                        operation_type='docx_to_pdf',
-                        request=request,
-                        document=document,
-                        page_count=1  # For now, assume 1 page - in real app, extract from DOCX
-                    )
-                    
-                    messages.success(request, 'Document converted successfully!')
-                    return redirect('download', document_id=document.id)
-                else:
-                    document.status = 'failed'
-                    document.save()
-                    messages.error(request, 'Conversion failed. Please try again.')
-            except Exception as conv_error:
-                document.status = 'failed'
-                document.save()
-                messages.error(request, f'Conversion error: {str(conv_error)}')
+            messages.info(request, 'Conversion started. Your PDF will be ready shortly.')
+            # Hand the document ID to the page's JS polling via the URL
+            return redirect(f"{reverse('convert')}?cid={document.id}")
                 
         except Exception as e:
             messages.error(request, f'An error occurred: {str(e)}')
             if 'document' in locals():
                 document.status = 'failed'
-                document.save()
+                document.save(update_fields=['status'])
     
-    # Get current conversion ID from session if exists
-    current_conversion_id = request.session.get('current_conversion_id')
+    # Get current conversion ID from the redirect after upload, if any
+    try:
+        current_conversion_id = uuid.UUID(request.GET.get('cid', ''))
+    except ValueError:
+        current_conversion_id = None
     
     return render(request, 'document/convert.html', {
         'recent_documents': recent_documents,
@@ -188,6 +175,8 @@ def check_conversion_status(request, document_id):
             response_data['download_url'] = f'/download/{document.id}/'
             response_data['user_balance'] = str(request.user.balance)
             response_data['free_conversions'] = request.user.free_conversions
+            response_data['page_count'] = document.page_count
+            response_data['cost'] = str(document.cost)
         
         return JsonResponse(response_data)
         
@@ -195,46 +184,41 @@ def check_conversion_status(request, document_id):
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
 
-def convert_docx_to_pdf(docx_path):
-    """Convert DOCX to PDF with proper Cyrillic support"""
-    from .utils import convert_docx_to_pdf_with_cyrillic
-    
+def convert_docx_to_pdf(docx_file, out_path):
+    """Convert DOCX (path or file object) to PDF with proper Cyrillic support, writing the PDF to out_path"""
     try:
         # Try the improved Cyrillic conversion first
-        pdf_content = convert_docx_to_pdf_with_cyrillic(docx_path)
-        if pdf_content:
-            return pdf_content
+        if convert_docx_to_pdf_with_cyrillic(docx_file, out_path):
+            return out_path
         
         print("Primary conversion failed, trying fallback...")
-        return convert_docx_to_pdf_simple(docx_path)
-        
     except Exception as e:
         print(f"Conversion error: {e}")
-        return convert_docx_to_pdf_simple(docx_path)
+    
+    # The primary pass may have consumed the stream
+    if hasattr(docx_file, 'seek'):
+        docx_file.seek(0)
+    
+    return convert_docx_to_pdf_simple(docx_file, out_path)
 
 
-def convert_docx_to_pdf_simple(docx_path):
-    """Simple fallback conversion method"""
+def convert_docx_to_pdf_simple(docx_file, out_path):
+    """Simple fallback conversion method, writing the PDF to out_path"""
     try:
-        from docx import Document as DocxDocument
-        from reportlab.lib.pagesizes import A4
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet
-        from reportlab.lib.utils import ImageReader
-        
         # Read DOCX
-        doc = DocxDocument(docx_path)
+        doc = DocxDocument(docx_file)
         
-        # Create PDF
-        buffer = io.BytesIO()
-        pdf = SimpleDocTemplate(buffer, pagesize=A4)
-        styles = getSampleStyleSheet()
+        # Create PDF straight into the target file rather than an in-memory buffer
+        pdf = SimpleDocTemplate(out_path, pagesize=A4)
+        styles = _STYLES
         story = []
         
         # Add title
         story.append(Paragraph("Converted Document", styles['Title']))
         story.append(Spacer(1, 20))
         
+        normal_style = styles['Normal']
+        
         # Extract text and try to handle encoding
         for para in doc.paragraphs:
             if para.text.strip():
@@ -242,45 +226,24 @@ def convert_docx_to_pdf_simple(docx_path):
                     # Try to handle Russian text by transliterating if needed
                     text = para.text.strip()
                     
-                    # Basic transliteration for display (fallback)
-                    replacements = {
-                        'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo',
-                        'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
-                        'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
-                        'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
-                        'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
-                        'А': 'A', 'Б': 'B', 'В': 'V', 'Г': 'G', 'Д': 'D', 'Е': 'E', 'Ё': 'YO',
-                        'Ж': 'ZH', 'З': 'Z', 'И': 'I', 'Й': 'Y', 'К': 'K', 'Л': 'L', 'М': 'M',
-                        'Н': 'N', 'О': 'O', 'П': 'P', 'Р': 'R', 'С': 'S', 'Т': 'T', 'У': 'U',
-                        'Ф': 'F', 'Х': 'H', 'Ц': 'TS', 'Ч': 'CH', 'Ш': 'SH', 'Щ': 'SCH',
-                        'Ъ': '', 'Ы': 'Y', 'Ь': '', 'Э': 'E', 'Ю': 'YU', 'Я': 'YA'
-                    }
-                    
                     # Only transliterate if we detect Cyrillic
-                    if any(ord(char) >= 1040 and ord(char) <= 1103 for char in text):
-                        transliterated = text
-                        for cyrillic, latin in replacements.items():
-                            transliterated = transliterated.replace(cyrillic, latin)
-                        text = f"[RU] {transliterated}"
+                    if _CYRILLIC_RE.search(text):
+                        text = f"[RU] {transliterate_cyrillic(text)}"
                     
-                    story.append(Paragraph(text, styles['Normal']))
-                    story.append(Spacer(1, 12))
+                    story.append(Paragraph(escape_xml_chars(text), normal_style))
                     
                 except Exception as e:
                     print(f"Error in simple conversion: {e}")
                     # Last resort: just add placeholder
-                    story.append(Paragraph("[Content could not be converted]", styles['Normal']))
-                    story.append(Spacer(1, 12))
+                    story.append(Paragraph("[Content could not be converted]", normal_style))
         
         if len(story) <= 2:  # Only title and spacer
             story.append(Paragraph("Document processed but no readable content found.", styles['Normal']))
         
         # Build PDF
         pdf.build(story)
-        pdf_content = buffer.getvalue()
-        buffer.close()
         
-        return pdf_content
+        return out_path
         
     except Exception as e:
         print(f"Simple conversion error: {e}")
@@ -296,19 +259,42 @@ def download_view(request, document_id):
         messages.error(request, 'Document is not ready for download.')
         return redirect('convert')
     
-    return FileResponse(
+    filename = os.path.basename(document.converted_file.name)
+    
+    if settings.USE_X_ACCEL_REDIRECT:
+        # nginx streams the file with sendfile(); the worker returns immediately
+        response = HttpResponse(content_type='application/pdf')
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+        response['X-Accel-Redirect'] = quote(f'{settings.PROTECTED_MEDIA_URL}{document.converted_file.name}')
+        return response
+    
+    response = FileResponse(
         document.converted_file.open('rb'),
         as_attachment=True,
-        filename=os.path.basename(document.converted_file.name)
+        filename=filename,
+        content_type='application/pdf'
     )
+    response.block_size = 64 * 1024  # default is 4KB
+    return response
 
 
 @login_required
 def dashboard_view(request):
     """User dashboard"""
-    documents = Document.objects.filter(user=request.user)[:20]
-    all_documents = Document.objects.filter(user=request.user)
-    transactions = Transaction.objects.filter(user=request.user)[:10]
+    # Only the columns the dashboard tables render
+    documents = Document.objects.filter(user=request.user).only(
+        'id', 'document_type', 'original_file', 'converted_file', 'status', 'file_size', 'created_at'
+    )[:20]
+    transactions = Transaction.objects.filter(user=request.user).only(
+        'id', 'transaction_type', 'operation_type', 'amount', 'is_successful', 'created_at'
+    )[:10]
+    
+    # Document counts in a single query
+    document_stats = Document.objects.filter(user=request.user).aggregate(
+        total=models.Count('id'),
+        successful=models.Count('id', filter=models.Q(status='completed')),
+        failed=models.Count('id', filter=models.Q(status='failed'))
+    )
     
     # Calculate total spending
     total_spent = Transaction.objects.filter(
@@ -318,9 +304,9 @@ def dashboard_view(request):
     ).aggregate(total=models.Sum('amount'))['total'] or 0
     
     stats = {
-        'total_conversions': all_documents.count(),
-        'successful': all_documents.filter(status='completed').count(),
-        'failed': all_documents.filter(status='failed').count(),
+        'total_conversions': document_stats['total'],
+        'successful': document_stats['successful'],
+        'failed': document_stats['failed'],
         'total_spent': total_spent,
     }
     
@@ -336,26 +322,29 @@ def add_balance_view(request):
     """Add balance to user account (placeholder)"""
     if request.method == 'POST':
         # This would integrate with a payment gateway
-        from decimal import Decimal
         amount = Decimal(str(request.POST.get('amount', 10)))
-        balance_before = request.user.balance
-        
-        request.user.balance += amount
-        request.user.save()
         
-        # Record transaction
-        Transaction.objects.create(
-            user=request.user,
-            transaction_type='balance_add',
-            amount=amount,
-            payment_method='credit_card',  # In real app, this would be dynamic
-            balance_before=balance_before,
-            balance_after=request.user.balance,
-            free_conversions_before=request.user.free_conversions,
-            free_conversions_after=request.user.free_conversions,
-            description=f'Balance top-up of €{amount}',
-            ip_address=request.META.get('REMOTE_ADDR')
-        )
+        with transaction.atomic():
+            # Lock the user row so the top-up can't race a conversion
+            user = User.objects.select_for_update().get(pk=request.user.pk)
+            balance_before = user.balance
+            
+            user.balance += amount
+            user.save(update_fields=['balance'])
+            
+            # Record transaction
+            Transaction.objects.create(
+                user=user,
+                transaction_type='balance_add',
+                amount=amount,
+                payment_method='credit_card',  # In real app, this would be dynamic
+                balance_before=balance_before,
+                balance_after=user.balance,
+                free_conversions_before=user.free_conversions,
+                free_conversions_after=user.free_conversions,
+                description=f'Balance top-up of €{amount}',
+                ip_address=request.META.get('REMOTE_ADDR')
+            )
         
         messages.success(request, f'€{amount} added to your balance!')
         return redirect('convert')
@@ -363,43 +352,61 @@ def add_balance_view(request):
     return render(request, 'document/add_balance.html')
 
 
+TRANSACTIONS_PAGE_SIZE = 20
+
+
 @login_required
 def transactions_view(request):
     """User transaction history"""
-    transactions = Transaction.objects.filter(user=request.user)
+    # Keyset pagination on (user, -created_at): each page is an index seek, not an OFFSET scan.
+    # The cursor is "<created_at>,<id>" so rows sharing a timestamp are not skipped.
+    transactions = Transaction.objects.filter(user=request.user).order_by('-created_at', '-id')
+    before = None
+    before_at, _, before_id = request.GET.get('before', '').rpartition(',')
+    try:
+        before_at = parse_datetime(before_at)
+        if before_at:
+            before = (before_at, uuid.UUID(before_id))
+    except ValueError:
+        pass
+    if before:
+        transactions = transactions.filter(
+            models.Q(created_at__lt=before[0]) | models.Q(created_at=before[0], id__lt=before[1])
+        )
     
-    # Calculate spending stats
-    conversion_stats = Transaction.objects.filter(
-        user=request.user,
-        transaction_type='conversion',
-        is_successful=True
-    ).aggregate(
-        total_spent=models.Sum('amount'),
-        total_conversions=models.Count('id')
-    )
+    # The table links each conversion to its document
+    transactions = list(transactions.select_related('document')[:TRANSACTIONS_PAGE_SIZE + 1])
+    next_cursor = None
+    if len(transactions) > TRANSACTIONS_PAGE_SIZE:
+        transactions = transactions[:TRANSACTIONS_PAGE_SIZE]
+        last = transactions[-1]
+        next_cursor = f'{last.created_at.isoformat()},{last.id}'
     
-    balance_stats = Transaction.objects.filter(
+    # Calculate spending stats in a single pass over successful transactions
+    transaction_stats = Transaction.objects.filter(
         user=request.user,
-        transaction_type='balance_add',
         is_successful=True
     ).aggregate(
-        total_added=models.Sum('amount')
+        total_spent=models.Sum('amount', filter=models.Q(transaction_type='conversion')),
+        total_conversions=models.Count('id', filter=models.Q(transaction_type='conversion')),
+        total_added=models.Sum('amount', filter=models.Q(transaction_type='balance_add')),
+        free_conversions_used=models.Count('id', filter=models.Q(
+            transaction_type='conversion',
+            payment_method='free_conversion'
+        ))
     )
     
     stats = {
-        'total_spent': conversion_stats['total_spent'] or 0,
-        'total_conversions': conversion_stats['total_conversions'] or 0,
-        'total_added': balance_stats['total_added'] or 0,
-        'free_conversions_used': Transaction.objects.filter(
-            user=request.user,
-            transaction_type='conversion',
-            payment_method='free_conversion',
-            is_successful=True
-        ).count()
+        'total_spent': transaction_stats['total_spent'] or 0,
+        'total_conversions': transaction_stats['total_conversions'],
+        'total_added': transaction_stats['total_added'] or 0,
+        'free_conversions_used': transaction_stats['free_conversions_used']
     }
     
     return render(request, 'document/transactions.html', {
         'transactions': transactions,
+        'next_cursor': next_cursor,
+        'is_paginated': before is not None,
         'stats': stats
     })
 
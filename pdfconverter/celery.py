@@ -0,0 +1,29 @@
+"""
+Celery application for background document conversion.
+
+Start a worker with ``celery -A pdfconverter worker``.
+"""
+
+import os
+
+from celery import Celery
+from celery.signals import worker_init
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pdfconverter.settings')
+
+app = Celery('pdfconverter')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
+
+
+@worker_init.connect
+def require_shared_database(**kwargs):
+    """Refuse to run production workers on SQLite, which is local to each container"""
+    from django.conf import settings
+
+    engine = settings.DATABASES['default']['ENGINE']
+    if not settings.DEBUG and engine == 'django.db.backends.sqlite3':
+        # SystemExit, because Celery logs and ignores ordinary exceptions from signal handlers
+        raise SystemExit(
+            'Celery workers need the database shared with web; set USE_SQLITE=False and DB_* settings.'
+        )